@@ -2,15 +2,19 @@
 
 import argparse
 import base64
+import concurrent.futures
+import functools
+import hashlib
+import http.client
 import json
 import os
 import subprocess
 import sys
-import urllib.error
+import threading
+import time
 import urllib.parse
-import urllib.request
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Iterable
 
 def load_env_file(path: Path) -> None:
     """Lightweight .env loader so we can run without python-dotenv."""
@@ -32,6 +36,27 @@ load_env_file(Path(__file__).resolve().parent.parent / ".env")
 
 DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash")
 TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", "0"))
+# Batch conversion: concurrent in-flight requests per key and per-key request rate.
+MAX_CONCURRENT_PER_KEY = int(os.getenv("GEMINI_MAX_CONCURRENT", "3"))
+REQUESTS_PER_SECOND = float(os.getenv("GEMINI_RPS_PER_KEY", "5"))
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+REQUEST_TIMEOUT = 540
+# Transient statuses retried on the same key with exponential backoff
+# (BACKOFF_FACTOR * 2**n seconds, or the server's Retry-After when given).
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1.5
+# PDFs below this size are sent inline (base64) to save the File API round trip;
+# larger ones are streamed through the File API upload endpoint.
+INLINE_PDF_LIMIT = 3 * 1024 * 1024
+FILE_PROCESSING_TIMEOUT = 120
+
+# Converted markdown is cached by PDF content + model + prompt so reruns are free.
+CACHE_DIR = Path(
+    os.getenv("PAPER_PARSE_CACHE_DIR")
+    or Path(os.getenv("XDG_CACHE_HOME") or "~/.cache").expanduser() / "paper-parse"
+)
 
 def get_api_keys() -> list[str]:
     """Load API keys with rotation support."""
@@ -63,6 +88,36 @@ if not API_KEYS:
     sys.exit(1)
 
 
+class TokenBucket:
+    """Thread-safe token bucket capping the request rate of a single API key."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+RATE_LIMITERS = {
+    key: TokenBucket(rate=REQUESTS_PER_SECOND, capacity=MAX_CONCURRENT_PER_KEY)
+    for key in API_KEYS
+}
+
+
+@functools.lru_cache(maxsize=4)
 def build_prompt(figure_dir_name: str | None) -> str:
     figure_rule = (
         "9. If a figure is present, keep figure references and captions. "
@@ -108,38 +163,47 @@ def extract_pdf_images(
     doc = fitz.open(pdf_path)
     extracted: list[dict[str, Any]] = []
 
-    for page_idx in range(len(doc)):
-        page = doc[page_idx]
-        images = page.get_images(full=True)
-        for image_idx, img in enumerate(images, start=1):
-            xref = img[0]
-            base = doc.extract_image(xref)
-            data = base.get("image")
-            ext = base.get("ext", "png")
-            width = int(base.get("width", 0))
-            height = int(base.get("height", 0))
-            if not data:
-                continue
-            if width < min_width or height < min_height or len(data) < min_bytes:
-                continue
-
-            file_name = f"figure_p{page_idx + 1:03d}_{image_idx:02d}.{ext}"
-            output_path = image_dir / file_name
-            output_path.write_bytes(data)
-
-            extracted.append(
-                {
-                    "figure_id": f"p{page_idx + 1}_{image_idx}",
-                    "file_name": file_name,
-                    "path": str(output_path),
-                    "page": page_idx + 1,
-                    "width": width,
-                    "height": height,
-                    "bytes": len(data),
-                }
-            )
-
-    doc.close()
+    decoded = 0
+    try:
+        for page_idx in range(len(doc)):
+            page = doc[page_idx]
+            images = page.get_images(full=True)
+            for image_idx, img in enumerate(images, start=1):
+                xref, _, raw_width, raw_height = img[:4]
+                # get_images() already reports pixel dimensions: reject small
+                # images (icons, glyphs) before extract_image() decodes them.
+                if raw_width < min_width or raw_height < min_height:
+                    continue
+                base = doc.extract_image(xref)
+                decoded += 1
+                if decoded % 20 == 0:
+                    fitz.TOOLS.store_shrink(100)
+                data = base.get("image")
+                ext = base.get("ext", "png")
+                width = int(base.get("width", 0))
+                height = int(base.get("height", 0))
+                if not data:
+                    continue
+                if width < min_width or height < min_height or len(data) < min_bytes:
+                    continue
+
+                file_name = f"figure_p{page_idx + 1:03d}_{image_idx:02d}.{ext}"
+                output_path = image_dir / file_name
+                output_path.write_bytes(data)
+
+                extracted.append(
+                    {
+                        "figure_id": f"p{page_idx + 1}_{image_idx}",
+                        "file_name": file_name,
+                        "path": str(output_path),
+                        "page": page_idx + 1,
+                        "width": width,
+                        "height": height,
+                        "bytes": len(data),
+                    }
+                )
+    finally:
+        doc.close()
     return extracted
 
 
@@ -190,6 +254,45 @@ def shutil_which(binary: str) -> str | None:
     return shutil.which(binary)
 
 
+def file_digest(path: Path) -> str:
+    """Hash file contents in chunks; uses blake3 when installed, else SHA-256."""
+    try:
+        import blake3
+
+        hasher = blake3.blake3()
+    except ImportError:
+        hasher = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def cache_key(pdf_path: Path, model: str, prompt: str) -> str:
+    settings = f"{model}\0{TEMPERATURE}\0{prompt}".encode("utf-8")
+    return f"{file_digest(pdf_path)[:16]}-{hashlib.sha256(settings).hexdigest()[:8]}"
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Write via a temp file + os.replace so readers never see a partial file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def store_cached_markdown(key: str, md_content: str, pdf_path: Path, model: str) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(CACHE_DIR / f"{key}.md", md_content)
+        info = {"input_pdf": str(pdf_path), "model": model, "temperature": TEMPERATURE}
+        write_text_atomic(
+            CACHE_DIR / f"{key}.assets.json",
+            json.dumps(info, ensure_ascii=False, indent=2),
+        )
+    except OSError as exc:
+        print(f"WARN: could not write cache entry {key}: {exc}")
+
+
 def convert_pdf_to_markdown(
     pdf_path: Path,
     output_md: Path,
@@ -197,8 +300,15 @@ def convert_pdf_to_markdown(
     extract_images: bool = False,
     image_dir: Path | None = None,
     meta_json: Path | None = None,
+    key_index: int = 0,
+    use_cache: bool = True,
 ) -> str:
-    """Convert a PDF file to Markdown and optionally extract figure assets."""
+    """Convert a PDF file to Markdown and optionally extract figure assets.
+
+    key_index selects the first API key to try; the remaining keys are used as
+    quota fallbacks in rotation order. With use_cache, Gemini output is looked up
+    in and saved to CACHE_DIR.
+    """
     if not pdf_path.exists():
         raise FileNotFoundError(f"Input PDF not found: {pdf_path}")
 
@@ -216,13 +326,22 @@ def convert_pdf_to_markdown(
 
     prompt = build_prompt(figure_dir_name=figure_dir_name if extract_images else None)
 
-    print(f"Converting with {model} (temperature={TEMPERATURE})...")
-    md_content = generate_markdown_with_gemini(
-        pdf_path=pdf_path,
-        prompt=prompt,
-        model=model,
-        api_keys=API_KEYS,
-    )
+    key = cache_key(pdf_path, model, prompt) if use_cache else None
+    cached_md = CACHE_DIR / f"{key}.md" if key else None
+    if cached_md is not None and cached_md.exists():
+        print(f"Using cached conversion: {cached_md}")
+        md_content = cached_md.read_text(encoding="utf-8")
+    else:
+        print(f"Converting with {model} (temperature={TEMPERATURE})...")
+        md_content = generate_markdown_with_gemini(
+            pdf_path=pdf_path,
+            prompt=prompt,
+            model=model,
+            api_keys=API_KEYS,
+            start_index=key_index,
+        )
+        if key:
+            store_cached_markdown(key, md_content, pdf_path, model)
     if extract_images and images:
         md_content += "\n\n## Extracted Figure Assets\n\n"
         for item in images:
@@ -248,6 +367,51 @@ def convert_pdf_to_markdown(
     return md_content
 
 
+def convert_many(
+    pdf_paths: list[Path],
+    output_dir: Path,
+    model: str,
+    extract_images: bool = False,
+    max_concurrent: int = MAX_CONCURRENT_PER_KEY,
+    use_cache: bool = True,
+) -> tuple[list[Path], list[dict[str, str]]]:
+    """Convert several PDFs concurrently, sharding them across API keys.
+
+    Each PDF is written to <output_dir>/<stem>.md. Job N starts on key
+    N % len(API_KEYS) and rotates to the other keys on quota errors. A failing
+    PDF is recorded in the returned failures list instead of aborting the batch.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    converted: list[Path] = []
+    failures: list[dict[str, str]] = []
+
+    max_workers = max(1, min(len(pdf_paths), len(API_KEYS) * max_concurrent))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                convert_pdf_to_markdown,
+                pdf_path=pdf_path,
+                output_md=output_dir / f"{pdf_path.stem}.md",
+                model=model,
+                extract_images=extract_images,
+                key_index=idx % len(API_KEYS),
+                use_cache=use_cache,
+            ): pdf_path
+            for idx, pdf_path in enumerate(pdf_paths)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                future.result()
+            except Exception as exc:  # noqa: BLE001
+                print(f"ERROR: {pdf_path.name}: {exc}")
+                failures.append({"pdf": str(pdf_path), "error": str(exc)})
+            else:
+                converted.append(output_dir / f"{pdf_path.stem}.md")
+
+    return converted, failures
+
+
 def extract_text_from_response(payload: dict[str, Any]) -> str:
     """Extract concatenated text parts from Gemini REST response."""
     candidates = payload.get("candidates", [])
@@ -266,68 +430,287 @@ def is_quota_error(http_code: int, detail: str) -> bool:
     return http_code == 429 or "RESOURCE_EXHAUSTED" in detail or "quota" in detail.lower()
 
 
+class GeminiAPIError(RuntimeError):
+    """Non-2xx response from the Gemini REST API."""
+
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(f"Gemini API HTTP {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+def raise_for_status(status: int, raw: bytes) -> None:
+    if not 200 <= status < 300:
+        raise GeminiAPIError(status, raw.decode("utf-8", errors="ignore"))
+
+
+_thread_local = threading.local()
+
+
+def get_connection(host: str) -> http.client.HTTPSConnection:
+    """Return this thread's keep-alive connection to host, opening it on first use."""
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    conn = connections.get(host)
+    if conn is None:
+        conn = http.client.HTTPSConnection(host, timeout=REQUEST_TIMEOUT)
+        connections[host] = conn
+    return conn
+
+
+def retry_delay(retry: int, retry_after: str | None) -> float:
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return BACKOFF_FACTOR * (2 ** retry)
+
+
+def is_resendable(stage: str, exc: BaseException) -> bool:
+    """Return True if exc, raised during stage, shows the request never reached the server.
+
+    Only then is resending safe: a connect failure, or a stale keep-alive
+    connection the server already closed (broken pipe/reset on send, or a
+    disconnect before any response). Timeouts and failures while reading a
+    response mean the server may be processing or have processed the request,
+    so they are never retried.
+    """
+    if isinstance(exc, TimeoutError):
+        return False
+    if stage == "connect":
+        return isinstance(exc, OSError)
+    if stage == "send":
+        return isinstance(exc, (BrokenPipeError, ConnectionResetError))
+    if stage == "response":
+        return isinstance(exc, http.client.RemoteDisconnected)
+    return False
+
+
+def http_request(
+    method: str,
+    url: str,
+    body: bytes | BinaryIO | Iterable[bytes] | None = None,
+    headers: dict[str, str] | None = None,
+) -> tuple[int, http.client.HTTPMessage, bytes]:
+    """Send a request over a pooled HTTPS connection and return (status, headers, body).
+
+    Connections are reused per thread and host so consecutive Gemini calls skip
+    the TCP/TLS handshake. Statuses in RETRY_STATUSES and connection failures
+    that happen before the request is accepted (see is_resendable) are retried
+    up to MAX_RETRIES times; the last response is returned as-is. A file object
+    body is streamed from its current position and rewound for each retry; an
+    iterable body must be re-iterable (see InlinePdfBody).
+    """
+    parts = urllib.parse.urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    body_start = body.tell() if hasattr(body, "seek") else None
+    retry = 0
+    while True:
+        conn = get_connection(parts.netloc)
+        if body_start is not None:
+            body.seek(body_start)
+        stage = "connect"
+        try:
+            if conn.sock is None:
+                conn.connect()
+            stage = "send"
+            conn.request(method, target, body=body, headers=headers or {})
+            stage = "response"
+            response = conn.getresponse()
+            stage = "read"
+            payload = response.read()
+        except Exception as exc:
+            conn.close()
+            if retry >= MAX_RETRIES or not is_resendable(stage, exc):
+                raise
+            time.sleep(retry_delay(retry, None))
+            retry += 1
+            continue
+        if response.will_close:
+            conn.close()
+        if response.status in RETRY_STATUSES and retry < MAX_RETRIES:
+            time.sleep(retry_delay(retry, response.getheader("Retry-After")))
+            retry += 1
+            continue
+        return response.status, response.headers, payload
+
+
+def upload_pdf(pdf_path: Path, api_key: str) -> str:
+    """Upload a PDF through the Gemini File API and return its file URI.
+
+    Uses the resumable upload protocol with the file streamed from disk, so the
+    PDF is never base64-encoded or held in memory.
+    """
+    size = pdf_path.stat().st_size
+    key_param = urllib.parse.quote(api_key)
+    status, headers, raw = http_request(
+        "POST",
+        f"{GEMINI_BASE_URL}/upload/v1beta/files?key={key_param}",
+        body=json.dumps({"file": {"display_name": pdf_path.name}}).encode("utf-8"),
+        headers={
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(size),
+            "X-Goog-Upload-Header-Content-Type": "application/pdf",
+            "Content-Type": "application/json",
+        },
+    )
+    raise_for_status(status, raw)
+    upload_url = headers.get("X-Goog-Upload-URL")
+    if not upload_url:
+        raise RuntimeError("Gemini File API did not return an upload URL.")
+
+    with pdf_path.open("rb") as fh:
+        status, _, raw = http_request(
+            "POST",
+            upload_url,
+            body=fh,
+            headers={
+                "Content-Length": str(size),
+                "X-Goog-Upload-Offset": "0",
+                "X-Goog-Upload-Command": "upload, finalize",
+            },
+        )
+    raise_for_status(status, raw)
+    file_info = json.loads(raw.decode("utf-8"))["file"]
+
+    # Large PDFs may still be processing; they cannot be referenced until ACTIVE.
+    deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT
+    while file_info.get("state") == "PROCESSING":
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Gemini File API processing timed out: {file_info['name']}")
+        time.sleep(2)
+        status, _, raw = http_request(
+            "GET", f"{GEMINI_BASE_URL}/v1beta/{file_info['name']}?key={key_param}"
+        )
+        raise_for_status(status, raw)
+        file_info = json.loads(raw.decode("utf-8"))
+    if file_info.get("state") == "FAILED":
+        raise RuntimeError(f"Gemini File API failed to process {pdf_path.name}")
+    return file_info["uri"]
+
+
+@functools.lru_cache(maxsize=64)
+def generate_endpoint(model: str, api_key: str) -> str:
+    """generateContent URL for model/key, built once per pair across a batch."""
+    return (
+        f"{GEMINI_BASE_URL}/v1beta/models/"
+        f"{urllib.parse.quote(model, safe='')}:generateContent?key={urllib.parse.quote(api_key)}"
+    )
+
+
+def build_request_body(prompt: str, pdf_part: dict[str, Any]) -> bytes:
+    request_body = {
+        "contents": [{"parts": [{"text": prompt}, pdf_part]}],
+        "generationConfig": {"temperature": TEMPERATURE},
+    }
+    return json.dumps(request_body).encode("utf-8")
+
+
+class InlinePdfBody:
+    """generateContent JSON body with the PDF inlined as base64, streamed from disk.
+
+    Iterating yields the JSON prefix, the base64-encoded PDF chunk by chunk and the
+    JSON suffix, so neither the PDF nor the ~4/3-size JSON payload is ever held
+    in memory. Each iteration re-reads the file, so the body can be resent on
+    retries and key rotation.
+    """
+
+    CHUNK_SIZE = 3 * 256 * 1024  # multiple of 3: chunks base64-encode without padding
+    PLACEHOLDER = "__PDF_BASE64__"
+
+    def __init__(self, pdf_path: Path, prompt: str) -> None:
+        self.pdf_path = pdf_path
+        template = build_request_body(
+            prompt, {"inline_data": {"mime_type": "application/pdf", "data": self.PLACEHOLDER}}
+        )
+        self.prefix, self.suffix = template.split(self.PLACEHOLDER.encode("ascii"), 1)
+        size = pdf_path.stat().st_size
+        self.length = len(self.prefix) + 4 * ((size + 2) // 3) + len(self.suffix)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        yield self.prefix
+        with self.pdf_path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(self.CHUNK_SIZE), b""):
+                yield base64.b64encode(chunk)
+        yield self.suffix
+
+
 def generate_markdown_with_gemini(
     pdf_path: Path,
     prompt: str,
     model: str,
     api_keys: list[str],
+    start_index: int = 0,
 ) -> str:
     """Call Gemini REST API directly, without external SDK dependency."""
-    pdf_b64 = base64.b64encode(pdf_path.read_bytes()).decode("ascii")
-    request_body = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": prompt},
-                    {"inline_data": {"mime_type": "application/pdf", "data": pdf_b64}},
-                ]
-            }
-        ],
-        "generationConfig": {"temperature": TEMPERATURE},
-    }
-    data = json.dumps(request_body).encode("utf-8")
+    inline_data: InlinePdfBody | None = None
+    if pdf_path.stat().st_size < INLINE_PDF_LIMIT:
+        inline_data = InlinePdfBody(pdf_path, prompt)
     last_error: str | None = None
-
-    for idx, api_key in enumerate(api_keys, start=1):
-        endpoint = (
-            "https://generativelanguage.googleapis.com/v1beta/models/"
-            f"{urllib.parse.quote(model, safe='')}:generateContent?key={urllib.parse.quote(api_key)}"
-        )
-        request = urllib.request.Request(
-            endpoint,
-            data=data,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
+    rotation = list(range(start_index, len(api_keys))) + list(range(start_index))
+
+    for attempt, key_pos in enumerate(rotation, start=1):
+        api_key = api_keys[key_pos]
+        idx = key_pos + 1
+        endpoint = generate_endpoint(model, api_key)
+        limiter = RATE_LIMITERS.get(api_key)
+        if limiter is not None:
+            limiter.acquire()
         try:
-            with urllib.request.urlopen(request, timeout=540) as response:
-                payload = json.loads(response.read().decode("utf-8"))
-            text = extract_text_from_response(payload)
-            if not text:
-                raise RuntimeError(
-                    f"Gemini API returned no text payload: {json.dumps(payload)[:1000]}"
+            data = inline_data
+            if data is None:
+                # Uploaded files are scoped to the key's project, so upload per key.
+                file_uri = upload_pdf(pdf_path, api_key)
+                data = build_request_body(
+                    prompt, {"file_data": {"mime_type": "application/pdf", "file_uri": file_uri}}
                 )
-            if idx > 1:
-                print(f"Switched to fallback API key #{idx} successfully.")
-            return text
-        except urllib.error.HTTPError as exc:
-            detail = exc.read().decode("utf-8", errors="ignore")
-            last_error = f"Gemini API HTTP {exc.code}: {detail}"
-            if idx < len(api_keys) and is_quota_error(exc.code, detail):
+            status, _, raw = http_request(
+                "POST",
+                endpoint,
+                body=data,
+                headers={"Content-Type": "application/json", "Content-Length": str(len(data))},
+            )
+            raise_for_status(status, raw)
+        except GeminiAPIError as exc:
+            # Still failing after backoff: rotate keys on quota errors only.
+            last_error = str(exc)
+            if attempt < len(rotation) and is_quota_error(exc.status, exc.detail):
                 print(f"API key #{idx} quota-exhausted. Trying next key...")
                 continue
-            raise RuntimeError(last_error) from exc
-        except urllib.error.URLError as exc:
+            raise
+        except (OSError, http.client.HTTPException) as exc:
             last_error = f"Gemini API connection failed: {exc}"
             raise RuntimeError(last_error) from exc
 
+        payload = json.loads(raw.decode("utf-8"))
+        text = extract_text_from_response(payload)
+        if not text:
+            raise RuntimeError(
+                f"Gemini API returned no text payload: {json.dumps(payload)[:1000]}"
+            )
+        if attempt > 1:
+            print(f"Switched to fallback API key #{idx} successfully.")
+        return text
+
     raise RuntimeError(last_error or "Gemini API call failed with unknown error.")
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Convert PDF to Markdown with Gemini API.")
-    parser.add_argument("input_pdf", help="Path to input PDF")
-    parser.add_argument("output_md", help="Path to output markdown")
+    parser.add_argument(
+        "input_pdf",
+        help="Path to input PDF, or a directory of PDFs to convert concurrently",
+    )
+    parser.add_argument(
+        "output_md",
+        help="Path to output markdown (output directory when input_pdf is a directory)",
+    )
     parser.add_argument(
         "--model",
         default=DEFAULT_MODEL,
@@ -348,22 +731,50 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Output JSON metadata path (default: <output>.assets.json).",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Always call Gemini instead of reusing cached conversions ({CACHE_DIR}).",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
+    input_path = Path(args.input_pdf).expanduser().resolve()
+
+    if input_path.is_dir():
+        if args.image_dir or args.meta_json:
+            print("ERROR: --image-dir/--meta-json are per-file options; omit them for directory input.")
+            sys.exit(1)
+        pdf_paths = sorted(input_path.glob("*.pdf"))
+        if not pdf_paths:
+            print(f"ERROR: no PDF files found in {input_path}")
+            sys.exit(1)
+        _, batch_failures = convert_many(
+            pdf_paths=pdf_paths,
+            output_dir=Path(args.output_md).expanduser().resolve(),
+            model=args.model,
+            extract_images=args.extract_images,
+            use_cache=not args.no_cache,
+        )
+        print(f"Converted {len(pdf_paths) - len(batch_failures)}/{len(pdf_paths)} PDF(s).")
+        for failure in batch_failures:
+            print(f"  FAILED {failure['pdf']}: {failure['error']}")
+        sys.exit(1 if batch_failures else 0)
+
     image_dir_path = Path(args.image_dir).expanduser().resolve() if args.image_dir else None
     meta_json_path = Path(args.meta_json).expanduser().resolve() if args.meta_json else None
 
     try:
         convert_pdf_to_markdown(
-            pdf_path=Path(args.input_pdf).expanduser().resolve(),
+            pdf_path=input_path,
             output_md=Path(args.output_md).expanduser().resolve(),
             model=args.model,
             extract_images=args.extract_images,
             image_dir=image_dir_path,
             meta_json=meta_json_path,
+            use_cache=not args.no_cache,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"ERROR: {exc}")
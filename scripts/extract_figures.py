@@ -12,7 +12,7 @@ Algorithm:
    - SI:    "Fig. SN." / "Table SN."  (abbreviation + S-prefix)
 2. Use caption Y-coordinates to determine figure boundaries:
    - Top boundary: previous caption bottom (or page content start)
-     Main: dashed vector separator lines (get_drawings) take precedence
+     Main: dashed vector separator lines (get_cdrawings) take precedence
      SI:   "Supplementary Figure/Table/Note" section title headers are skipped
    - Bottom boundary: current caption top
      SI:   use last non-caption content block bottom if it overlaps caption top
@@ -28,6 +28,8 @@ import argparse
 import os
 import re
 import json
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     import fitz  # pymupdf
@@ -41,6 +43,14 @@ import numpy as np
 
 ZOOM = 4  # render resolution multiplier (4x ~= 300 dpi equivalent)
 
+# Output encoders: (file extension, cv2.imencode params). The crops are
+# attachments for the Markdown, so PNG uses fast compression level 1 and WebP
+# (quality 90) trades exact pixels for much smaller, faster-to-write files.
+IMAGE_FORMATS = {
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "webp": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 90]),
+}
+
 # ── Caption patterns ──────────────────────────────────────────────────────────
 
 # Main article: "Figure 1." / "Table 2."
@@ -60,12 +70,25 @@ SI_SECTION_RE = re.compile(
     re.IGNORECASE,
 )
 
+# Every caption (main or SI) starts with one of these, case-insensitively.
+# Checked before the regex so ordinary text blocks never enter the engine.
+CAPTION_PREFIXES = ("fig", "table")
+
+
+def match_caption(caption_re, text):
+    """caption_re.match(text), short-circuiting blocks that cannot be captions."""
+    if not text[:5].lower().startswith(CAPTION_PREFIXES):
+        return None
+    return caption_re.match(text)
+
 
 # ── Image trimming ────────────────────────────────────────────────────────────
 
-def trim_whitespace(img, pad=10, white_thresh=245, dark_row_thresh=200):
+def trim_box(gray, pad=10, white_thresh=245, dark_row_thresh=200):
     """
-    Three-pass trim applied to every extracted region:
+    Three-pass trim applied to every extracted region (grayscale input).
+    Returns the (y0, y1, x0, x1) slice bounds of the trimmed region, or None if
+    the region is entirely white:
 
     Pass 1 — Dark-bar removal: strip rows from top where row_mean < dark_row_thresh.
              Removes the gray 'www.nature.com/scientificreports/' raster header bar
@@ -75,176 +98,264 @@ def trim_whitespace(img, pad=10, white_thresh=245, dark_row_thresh=200):
              where col.min() < 220. Handles figures occupying only the left half of a
              two-column page layout. Adds 12 px padding.
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     h, w = gray.shape
 
-    # Pass 1: dark header rows at top
-    top_start = 0
-    for r in range(h):
-        row_mean = float(gray[r].mean())
-        if row_mean < dark_row_thresh:
-            top_start = r + 1
-        elif row_mean > white_thresh - 5:
-            break
-
-    # Pass 2: bounding box of non-white content
+    # Pass 1: dark header rows at top — the last dark row before the first
+    # near-white row ends the header bar. cv2.reduce runs SIMD u8 reductions;
+    # a float32 average keeps threshold comparisons exact (a u8 result would
+    # round the means).
+    row_means = cv2.reduce(gray, 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F).ravel()
+    white_rows = row_means > white_thresh - 5
+    first_white = int(white_rows.argmax()) if white_rows.any() else h
+    dark_rows = np.flatnonzero(row_means[:first_white] < dark_row_thresh)
+    top_start = int(dark_rows[-1]) + 1 if dark_rows.size else 0
+
+    # Pass 2: bounding box of non-white content, from row/column projections
+    # of the mask (O(h + w) memory instead of one coordinate pair per pixel)
     sub = gray[top_start:, :]
     mask = sub < white_thresh
-    coords = np.argwhere(mask)
-    if len(coords) == 0:
+    rows_any = mask.any(axis=1)
+    if not rows_any.any():
         return None  # completely white/empty — caller should handle
-    y0, x0 = coords.min(axis=0)
-    y1, x1 = coords.max(axis=0)
-    y0 += top_start
-    y1 += top_start
+    cols_any = mask.any(axis=0)
+    y0 = int(rows_any.argmax()) + top_start
+    y1 = len(rows_any) - 1 - int(rows_any[::-1].argmax()) + top_start
+    x0 = int(cols_any.argmax())
+    x1 = len(cols_any) - 1 - int(cols_any[::-1].argmax())
 
     # Pass 3: right-side column trim (applied to post-Pass-1 sub-image only)
     # Use the cropped sub-image (after header removal) to avoid the full-width
     # journal header bar (present in main article pages) from polluting the
     # column min check and preventing right-side trim.
-    sub_for_right = gray[top_start:, :]
-    right_end = x1
-    for c in range(w - 1, x0, -1):
-        if sub_for_right[:, c].min() < 220:
-            right_end = c
-            break
+    col_mins = gray[top_start:, x0 + 1:].min(axis=0)
+    dark_cols = np.flatnonzero(col_mins < 220)
+    right_end = x0 + 1 + int(dark_cols[-1]) if dark_cols.size else x1
     x1 = min(right_end + 12, w - 1)
 
-    return img[
-        max(0, y0 - pad) : min(h, y1 + pad + 1),
-        max(0, x0 - pad) : min(w, x1 + pad + 1),
-    ]
+    return (
+        max(0, y0 - pad), min(h, y1 + pad + 1),
+        max(0, x0 - pad), min(w, x1 + pad + 1),
+    )
 
 
-# ── Page helpers ──────────────────────────────────────────────────────────────
+def trim_whitespace(img, pad=10, white_thresh=245, dark_row_thresh=200):
+    """Apply trim_box() to a BGR image and return the cropped image (or None)."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    box = trim_box(gray, pad=pad, white_thresh=white_thresh, dark_row_thresh=dark_row_thresh)
+    if box is None:
+        return None
+    y0, y1, x0, x1 = box
+    return img[y0:y1, x0:x1]
 
-def get_page_content_top(page):
+
+def render_trimmed(page, clip, mat):
     """
-    Return the Y coordinate where actual content begins, skipping the
-    journal header line (e.g. 'www.nature.com/scientificreports/').
+    Render 'clip' and return the trimmed color image, or None if the trimmed
+    region is empty or smaller than 20 px in either dimension.
+
+    alpha=False makes MuPDF emit 3-channel samples, so the render feeds
+    trim_whitespace() directly with no BGRA->BGR pass; the crop is a view
+    into that single render.
     """
-    header_bottom = 0
-    for b in page.get_text("blocks"):
-        text = b[4].strip()
-        y_top, y_bot = b[1], b[3]
-        if y_top < 40 and any(kw in text.lower() for kw in ["www.", "doi", "nature", "scientific", "journal"]):
-            header_bottom = max(header_bottom, y_bot)
-    return header_bottom + 2 if header_bottom > 0 else 10
+    pix = page.get_pixmap(matrix=mat, clip=clip, alpha=False)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+    pix = None
+    img = trim_whitespace(img)
+    if img is None or img.shape[0] < 20 or img.shape[1] < 20:
+        return None
+    return img
+
 
+# ── Page index ────────────────────────────────────────────────────────────────
 
-def get_dashed_separator_y(page, above_y):
+@dataclass
+class PageIndex:
     """
-    Return the Y of a dashed vector separator line (if any) on this page above
-    'above_y'. Scientific Reports renders section dividers as dashed vector lines
-    detectable via get_drawings() with non-empty dashes values.
-    Returns None if no dashed line is found.
+    Layout facts for one caption page, gathered in a single walk over its text
+    blocks so per-caption boundary queries are pure arithmetic.
+
+    content_top     — Y where content starts below the journal header line
+    captions        — caption dicts found on the page, in block order
+    header_bottoms  — SI: bottom Y of 'Supplementary ...' section title blocks
+    content_blocks  — SI: (y_top, y_bot, has_text) of non-caption, non-header blocks
+    dashed_ys       — main: Y of dashed vector separator lines
     """
-    result = None
-    for d in page.get_drawings():
-        dashes = d.get("dashes")
-        if dashes and str(dashes) != "[] 0":
-            line_y = d["rect"].y0
-            if line_y < above_y:
-                if result is None or line_y > result:
-                    result = line_y
-    return result
-
-
-def get_si_section_header_bottom(page, above_y):
+    content_top: float
+    captions: list
+    header_bottoms: list = field(default_factory=list)
+    content_blocks: list = field(default_factory=list)
+    dashed_ys: list = field(default_factory=list)
+
+    # Derived sorted / column arrays for the per-caption boundary queries
+    header_bottoms_sorted: np.ndarray = field(init=False, repr=False)
+    content_y_top: np.ndarray = field(init=False, repr=False)
+    content_y_bot: np.ndarray = field(init=False, repr=False)
+    content_has_text: np.ndarray = field(init=False, repr=False)
+    content_y_bot_sorted: np.ndarray = field(init=False, repr=False)
+    dashed_ys_sorted: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.header_bottoms_sorted = np.sort(np.asarray(self.header_bottoms, dtype=np.float64))
+        content = np.asarray(self.content_blocks, dtype=np.float64).reshape(-1, 3)
+        self.content_y_top = content[:, 0]
+        self.content_y_bot = content[:, 1]
+        self.content_has_text = content[:, 2].astype(bool)
+        self.content_y_bot_sorted = np.sort(self.content_y_bot)
+        self.dashed_ys_sorted = np.sort(np.asarray(self.dashed_ys, dtype=np.float64))
+
+
+def caption_entry(page_num, block, text, m, si):
     """
-    Return the bottom Y of any 'Supplementary Figure/Table/Note ...' section
-    title block on the page that sits above 'above_y'. These are text blocks
-    (not raster bars) and must be excluded from figure region calculation.
-    Returns 0 if none found.
+    Build the caption dict {page, label, type, rect, caption_text} for a block.
+
+    For SI files, the output label always receives an 's' prefix:
+      "Fig. S1."  -> sfigure1
+      "Table S2." -> stable2
+      "Fig. 3."   -> sfigure3  (SI without S-prefix numbering)
     """
-    bottom = 0
-    for b in page.get_text("blocks"):
-        text = b[4].strip()
-        y_bot = b[3]
-        if y_bot < above_y and SI_SECTION_RE.match(text):
-            bottom = max(bottom, y_bot)
-    return bottom
+    kind = m.group(1).lower()
+    num = m.group(2)
+    kind_norm = "table" if "table" in kind else "figure"
+
+    if si:
+        num_clean = re.sub(r'^[Ss]', '', num) or num
+        label = f"s{kind_norm}{num_clean}"
+    else:
+        label = f"{kind_norm}{num}"
+
+    return {
+        "page": page_num,
+        "label": label,
+        "type": kind_norm,
+        "rect": fitz.Rect(block[0], block[1], block[2], block[3]),
+        "caption_text": text,
+    }
 
 
-def get_last_content_bottom(page, caption_top_y, caption_re):
+def dashed_separator_ys(drawings):
     """
-    Return the bottom Y of the last non-caption content block whose Y range ends
-    at or below caption_top_y + small tolerance. Used in SI to prevent axis label
-    clipping when axis label and caption text blocks share overlapping Y ranges.
+    Y of every dashed vector separator line. Scientific Reports renders section
+    dividers as dashed vector lines detectable via get_cdrawings() with non-empty
+    dashes values. get_cdrawings() is the compact form of get_drawings(): same
+    keys, but 'rect' is a plain (x0, y0, x1, y1) tuple and no Rect/Point objects
+    are built per path.
     """
-    last_y = 0
-    for b in page.get_text("blocks"):
-        text = b[4].strip()
-        y_bot = b[3]
-        if caption_re.match(text):
-            continue
-        if SI_SECTION_RE.match(text):
-            continue
-        if y_bot <= caption_top_y + 5:
-            last_y = max(last_y, y_bot)
-    return last_y
-
+    ys = []
+    for d in drawings:
+        dashes = d.get("dashes")
+        if dashes and str(dashes) != "[] 0":
+            ys.append(d["rect"][1])
+    return ys
 
-# ── Caption detection ─────────────────────────────────────────────────────────
 
-def find_all_captions(doc, si=False):
+def build_page_index(doc, si=False):
     """
-    Scan every page for caption blocks matching the appropriate pattern.
-    Returns list of dicts: {page, label, type, rect, caption_text}
-
-    For SI files, the output label always receives an 's' prefix:
-      "Fig. S1."  -> sfigure1
-      "Table S2." -> stable2
-      "Fig. 3."   -> sfigure3  (SI without S-prefix numbering)
+    Walk every page's text blocks once: detect caption blocks, find the journal
+    header bottom and (SI) classify section headers vs other content blocks.
+    Returns {page_num: PageIndex} for pages that contain at least one caption;
+    drawings are only extracted for those pages.
 
-    May return duplicate labels when the same caption string appears on multiple
+    May yield duplicate labels when the same caption string appears on multiple
     pages (e.g. in a TOC on page 1 and on its actual content page). Deduplication
     is handled by run() after extraction succeeds: a label is locked-in only when
     an actual image is successfully extracted, so a TOC hit that produces no
     image region will not block the real content page.
     """
-    captions = []
     pattern = CAPTION_RE_SI if si else CAPTION_RE_MAIN
+    page_index = {}
 
     for page_num in range(len(doc)):
-        page = doc[page_num]
-
         # SI page 0 is always the cover/TOC page — skip caption detection entirely
         if si and page_num == 0:
             continue
 
+        page = doc[page_num]
+        captions = []
+        header_bottoms = []
+        content_blocks = []
+        journal_header_bottom = 0
         for b in page.get_text("blocks"):
             text = b[4].strip()
-            m = pattern.match(text)
+            y_top, y_bot = b[1], b[3]
+            if y_top < 40 and any(kw in text.lower() for kw in ["www.", "doi", "nature", "scientific", "journal"]):
+                journal_header_bottom = max(journal_header_bottom, y_bot)
+            m = match_caption(pattern, text)
             if m:
-                kind = m.group(1).lower()
-                num = m.group(2)
-                kind_norm = "table" if "table" in kind else "figure"
-
-                if si:
-                    num_clean = re.sub(r'^[Ss]', '', num) or num
-                    label = f"s{kind_norm}{num_clean}"
-                else:
-                    label = f"{kind_norm}{num}"
-
-                captions.append({
-                    "page": page_num,
-                    "label": label,
-                    "type": kind_norm,
-                    "rect": fitz.Rect(b[0], b[1], b[2], b[3]),
-                    "caption_text": text,
-                })
-    return captions
+                captions.append(caption_entry(page_num, b, text, m, si))
+            if si:
+                if SI_SECTION_RE.match(text):
+                    header_bottoms.append(y_bot)
+                elif not m:
+                    content_blocks.append((y_top, y_bot, bool(text)))
+
+        if not captions:
+            continue
+        page_index[page_num] = PageIndex(
+            content_top=journal_header_bottom + 2 if journal_header_bottom > 0 else 10,
+            captions=captions,
+            header_bottoms=header_bottoms,
+            content_blocks=content_blocks,
+            dashed_ys=[] if si else dashed_separator_ys(page.get_cdrawings()),
+        )
+    return page_index
+
+
+# ── Page helpers ──────────────────────────────────────────────────────────────
+
+def get_dashed_separator_y(index, above_y):
+    """
+    Return the Y of the lowest dashed separator line on this page above
+    'above_y', or None if there is none.
+    """
+    i = np.searchsorted(index.dashed_ys_sorted, above_y, side="left")
+    return float(index.dashed_ys_sorted[i - 1]) if i else None
+
+
+def get_si_section_header_bottom(index, above_y):
+    """
+    Return the bottom Y of any 'Supplementary Figure/Table/Note ...' section
+    title block on the page that sits above 'above_y'. These are text blocks
+    (not raster bars) and must be excluded from figure region calculation.
+    Returns 0 if none found.
+    """
+    i = np.searchsorted(index.header_bottoms_sorted, above_y, side="left")
+    return float(index.header_bottoms_sorted[i - 1]) if i else 0
+
+
+def get_last_content_bottom(index, caption_top_y):
+    """
+    Return the bottom Y of the last non-caption content block whose Y range ends
+    at or below caption_top_y + small tolerance. Used in SI to prevent axis label
+    clipping when axis label and caption text blocks share overlapping Y ranges.
+    """
+    i = np.searchsorted(index.content_y_bot_sorted, caption_top_y + 5, side="right")
+    return float(index.content_y_bot_sorted[i - 1]) if i else 0
+
+
+def get_last_text_bottom(index, scan_top, caption_top_y):
+    """
+    Return the bottom Y of the last non-empty body text block between scan_top
+    and the caption (with a 5 pt gap), or scan_top if there is none.
+    """
+    selected = index.content_y_bot[
+        index.content_has_text
+        & (index.content_y_top >= scan_top)
+        & (index.content_y_bot < caption_top_y - 5)
+    ]
+    return float(selected.max()) if selected.size else scan_top
 
 
 # ── Region extraction ─────────────────────────────────────────────────────────
 
-def extract_figure(doc, caption, prev_cap_bottom, mat, si=False):
+def extract_figure(doc, caption, prev_cap_bottom, mat, index, si=False):
     """
     Render the region above the caption (the actual figure/table image),
     trim whitespace, and return (img_array, caption_bottom_y).
     Returns None if the region is too small to be meaningful.
 
+    'index' is the caption page's PageIndex; all boundary decisions are made
+    from it without touching the page's text or drawings again.
+
     Fallback for caption-above-table layout (SI only):
       Some SI tables place the title caption ABOVE the table body rather than
       below it (i.e. the standard figure layout is reversed). When the above-
@@ -256,17 +367,16 @@ def extract_figure(doc, caption, prev_cap_bottom, mat, si=False):
     page_rect = page.rect
     cap_top_y = caption["rect"].y0
     cap_bot_y = caption["rect"].y1
-    caption_re = CAPTION_RE_SI if si else CAPTION_RE_MAIN
 
     # ── Top boundary ──────────────────────────────────────────────────────────
     if prev_cap_bottom is not None:
         fig_top_y = prev_cap_bottom + 3
     else:
-        fig_top_y = get_page_content_top(page)
+        fig_top_y = index.content_top
 
     if si:
         # SI: push top boundary past any section title header text block
-        header_bottom = get_si_section_header_bottom(page, cap_top_y)
+        header_bottom = get_si_section_header_bottom(index, cap_top_y)
         if header_bottom > fig_top_y:
             fig_top_y = header_bottom + 2
 
@@ -276,24 +386,18 @@ def extract_figure(doc, caption, prev_cap_bottom, mat, si=False):
         # figure, indicating a clear text/figure boundary.
         # This also covers continuation pages where header_bottom == 0.
         scan_top = header_bottom if header_bottom > 0 else fig_top_y
-        last_text_y = scan_top
-        for b in page.get_text("blocks"):
-            text = b[4].strip()
-            y_top, y_bot = b[1], b[3]
-            if y_top >= scan_top and y_bot < cap_top_y - 5:
-                if not caption_re.match(text) and not SI_SECTION_RE.match(text) and text:
-                    last_text_y = max(last_text_y, y_bot)
+        last_text_y = get_last_text_bottom(index, scan_top, cap_top_y)
         # Apply only if there is a blank gap of > 30 pt after the last text
         if last_text_y > scan_top and (cap_top_y - last_text_y) > 30:
             fig_top_y = max(fig_top_y, last_text_y + 3)
     else:
-        dashed_y = get_dashed_separator_y(page, cap_top_y)
+        dashed_y = get_dashed_separator_y(index, cap_top_y)
         if dashed_y is not None and dashed_y > fig_top_y:
             fig_top_y = dashed_y + 2
 
     # ── Bottom boundary ───────────────────────────────────────────────────────
     if si:
-        last_content_y = get_last_content_bottom(page, cap_top_y, caption_re)
+        last_content_y = get_last_content_bottom(index, cap_top_y)
         clip_bottom = max(last_content_y, cap_top_y) + 2
     else:
         clip_bottom = cap_top_y - 3
@@ -308,24 +412,15 @@ def extract_figure(doc, caption, prev_cap_bottom, mat, si=False):
     if clip.height < 20 or clip.width < 20:
         img = None
     else:
-        pix = page.get_pixmap(matrix=mat, clip=clip)
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-        if pix.n == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-        img = trim_whitespace(img)
-        # If trim left almost nothing (or entirely white), treat as empty
-        if img is None or img.shape[0] < 20 or img.shape[1] < 20:
-            img = None
+        # If trim leaves almost nothing (or entirely white), treat as empty
+        img = render_trimmed(page, clip, mat)
 
     # ── Fallback: caption-above-body layout (SI tables) ───────────────────────
     # If the region above the caption is empty/too small, try the region BELOW.
     if img is None and si:
-        all_caps_on_page = [
-            b for b in page.get_text("blocks")
-            if caption_re.match(b[4].strip()) and b[1] > cap_bot_y + 5
-        ]
-        if all_caps_on_page:
-            next_cap_y = min(b[1] for b in all_caps_on_page)
+        next_caps = [c["rect"].y0 for c in index.captions if c["rect"].y0 > cap_bot_y + 5]
+        if next_caps:
+            next_cap_y = min(next_caps)
             below_bottom = next_cap_y - 3
         else:
             below_bottom = page_rect.y1 - 5
@@ -337,64 +432,137 @@ def extract_figure(doc, caption, prev_cap_bottom, mat, si=False):
             below_bottom,
         )
         if below_clip.height >= 20 and below_clip.width >= 20:
-            pix = page.get_pixmap(matrix=mat, clip=below_clip)
-            img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-            if pix.n == 4:
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-            img = trim_whitespace(img)
-            if img is None or img.shape[0] < 20 or img.shape[1] < 20:
-                img = None
+            img = render_trimmed(page, below_clip, mat)
 
     if img is None:
         return None
 
     return img, caption["rect"].y1
 
-def run(pdf_path, out_dir, si=False):
+# ── Per-page extraction (process pool) ─────────────────────────────────────────
+
+# Outcome marker for a caption skipped because its label was already extracted
+DUPLICATE = "duplicate"
+
+
+def extract_page_figures(doc, page_num, index, si=False, image_format="png",
+                         skip_labels=frozenset()):
+    """
+    Extract every caption on one page, in order, and return one outcome per
+    caption: (encoded_bytes, width, height), None if the region was too small, or
+    DUPLICATE if the label is in 'skip_labels' or was already extracted earlier
+    on this page. Each figure's top boundary chains from the previous
+    successfully extracted caption on the same page, as in the serial scan.
+    """
+    mat = fitz.Matrix(ZOOM, ZOOM)
+    ext, params = IMAGE_FORMATS[image_format]
+    extracted = set(skip_labels)
+    prev_bottom = None
+    outcomes = []
+    for cap in index.captions:
+        if cap["label"] in extracted:
+            outcomes.append(DUPLICATE)
+            continue
+        result = extract_figure(doc, cap, prev_bottom, mat, index, si=si)
+        if result is None:
+            outcomes.append(None)
+            continue
+        img, prev_bottom = result
+        extracted.add(cap["label"])
+        ok, buf = cv2.imencode(ext, img, params)
+        if not ok:
+            raise RuntimeError(f"{image_format} encoding failed for {cap['label']}")
+        outcomes.append((buf.tobytes(), img.shape[1], img.shape[0]))
+
+    # MuPDF's store keeps page resources and rasters cached without limit;
+    # release them so resident memory stays around one page's worth at 4x zoom.
+    fitz.TOOLS.store_shrink(100)
+    return outcomes
+
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    # fitz.Document is not picklable: each worker process opens the PDF once.
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _extract_page_worker(task):
+    page_num, index, si, image_format = task
+    return extract_page_figures(_worker_doc, page_num, index, si=si, image_format=image_format)
+
+
+def run(pdf_path, out_dir, si=False, workers=None, image_format="png"):
     os.makedirs(out_dir, exist_ok=True)
     doc = fitz.open(pdf_path)
-    mat = fitz.Matrix(ZOOM, ZOOM)
     mode = "SI" if si else "main article"
     print(f"Mode: {mode}  |  PDF: {pdf_path}")
 
-    captions = find_all_captions(doc, si=si)
-    if not captions:
+    # One pass over every page's blocks; extraction only does arithmetic on it.
+    page_index = build_page_index(doc, si=si)
+    if not page_index:
         print("No Figure/Table captions detected.")
+        doc.close()
         return []
 
+    # Pages are independent (rasterization + OpenCV is CPU-bound), so render
+    # them in parallel; files are written here to keep dedup in caption order.
+    tasks = [(page_num, index, si, image_format) for page_num, index in page_index.items()]
+    workers = min(len(tasks), workers or os.cpu_count() or 1)
+
     manifest = []
-    prev_cap_bottom_by_page = {}
     extracted_labels = set()  # dedup: label is locked in only after a successful extraction
 
-    for cap in captions:
-        page_num = cap["page"]
-        label = cap["label"]
-
-        # Skip if this label was already successfully extracted (handles TOC duplicates)
-        if label in extracted_labels:
-            print(f"  SKIP duplicate [{label}] on page {page_num + 1} (already extracted)")
-            continue
-
-        prev_bottom = prev_cap_bottom_by_page.get(page_num)
-        result = extract_figure(doc, cap, prev_bottom, mat, si=si)
-        if result is None:
-            print(f"  SKIP {label} (region too small)  page {page_num + 1}")
-            continue
-
-        img, cap_bottom = result
-        prev_cap_bottom_by_page[page_num] = cap_bottom
-        extracted_labels.add(label)  # lock in label only now
-
-        out_path = os.path.join(out_dir, f"{label}.png")
-        cv2.imwrite(out_path, img)
-        print(f"  {label}.png  {img.shape[1]}x{img.shape[0]}px")
-
-        manifest.append({
-            "label": label,
-            "type": cap["type"],
-            "path": out_path,
-            "caption_text": cap["caption_text"],
-        })
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)
+        )
+        results = executor.map(_extract_page_worker, tasks)
+    else:
+        results = (extract_page_figures(doc, *task) for task in tasks)
+
+    try:
+        for (page_num, index, _, _), outcomes in zip(tasks, results):
+            # Workers cannot see labels locked in on earlier pages (TOC
+            # duplicates); redo such a page with those labels excluded so the
+            # top-boundary chain matches a serial scan.
+            if any(cap["label"] in extracted_labels for cap in index.captions):
+                outcomes = extract_page_figures(
+                    doc, page_num, index, si=si, image_format=image_format,
+                    skip_labels=frozenset(extracted_labels),
+                )
+
+            for cap, outcome in zip(index.captions, outcomes):
+                label = cap["label"]
+                if outcome == DUPLICATE:
+                    print(f"  SKIP duplicate [{label}] on page {page_num + 1} (already extracted)")
+                    continue
+                if outcome is None:
+                    print(f"  SKIP {label} (region too small)  page {page_num + 1}")
+                    continue
+
+                data, width, height = outcome
+                extracted_labels.add(label)  # lock in label only now
+
+                file_name = f"{label}.{image_format}"
+                out_path = os.path.join(out_dir, file_name)
+                with open(out_path, "wb") as f:
+                    f.write(data)
+                print(f"  {file_name}  {width}x{height}px")
+
+                manifest.append({
+                    "label": label,
+                    "type": cap["type"],
+                    "path": out_path,
+                    "caption_text": cap["caption_text"],
+                })
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        doc.close()
 
     manifest_path = os.path.join(out_dir, "manifest.json")
     with open(manifest_path, "w") as f:
@@ -414,5 +582,17 @@ if __name__ == "__main__":
         action="store_true",
         help="Treat input as a Supplementary Information (SI) file",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for page rendering (default: CPU count)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(IMAGE_FORMATS),
+        default="png",
+        help="Output image format (default: png)",
+    )
     args = parser.parse_args()
-    run(args.pdf, args.out_dir, si=args.si)
+    run(args.pdf, args.out_dir, si=args.si, workers=args.workers, image_format=args.format)
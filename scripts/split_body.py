@@ -22,59 +22,156 @@ DO NOT run on SI files — SI files have no 4-part split (Pipeline B ends at Ste
 
 import sys
 import argparse
+import contextlib
+import functools
+import mmap
 import os
 import re
 
 
 # ── Section boundary keywords ─────────────────────────────────────────────────
 
-# Marks the start of the abstract / body (end of header)
-ABSTRACT_RE = re.compile(r'^#+\s*Abstract\b', re.IGNORECASE)
-
-# Marks the start of the references section
-REFERENCE_RE = re.compile(r'^#+\s*References?\b', re.IGNORECASE)
+# Horizontal whitespace: exactly what str-mode \s matches apart from \n, spelled
+# out in UTF-8 so the bytes patterns split on the same Unicode spaces (NBSP,
+# thin and ideographic spaces, ...) as the original text-mode patterns did.
+HSPACE = (
+    rb'(?:[\t\x0b\x0c\r \x1c-\x1f]|\xc2[\x85\xa0]|\xe1\x9a\x80'
+    rb'|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)'
+)
 
-# Marks the start of backmatter sections
-BACKMATTER_RE = re.compile(
-    r'^#+\s*(Acknowledgements?|Acknowledgments?|Author\s+Contributions?'
-    r'|Data\s+Availability|Competing\s+Interests?|Additional\s+Information'
-    r'|Ethics\s+Declaration|Consent|Funding)',
-    re.IGNORECASE,
+# One alternation over the whole file; the named group that matched tells which
+# boundary a heading marks.  HSPACE keeps every match within a single line.
+# Patterns are bytes so they run directly over the mmapped input.
+#   abs — start of the abstract / body (end of header)
+#   ref — start of the references section
+#   bm  — start of backmatter sections
+BOUNDARY_RE = re.compile(
+    rb'^#+' + HSPACE + rb'*(?:(?P<abs>Abstract\b)|(?P<ref>References?\b)'
+    rb'|(?P<bm>Acknowledgements?|Acknowledgments?|Author' + HSPACE + rb'+Contributions?'
+    rb'|Data' + HSPACE + rb'+Availability|Competing' + HSPACE + rb'+Interests?'
+    rb'|Additional' + HSPACE + rb'+Information|Ethics' + HSPACE + rb'+Declaration'
+    rb'|Consent|Funding))',
+    re.IGNORECASE | re.MULTILINE,
 )
 
-IMAGE_LINK_RE = re.compile(r'!\[.*?\]\(.*?\)\n?')
+# Fallback header/body split: any heading line
+HEADING_RE = re.compile(rb'^#+' + HSPACE + rb'+(?!' + HSPACE + rb')\S', re.MULTILINE)
+
+IMAGE_LINK_RE = re.compile(rb'!\[.*?\]\(.*?\)\n?')
+BLANKRUN_RE = re.compile(rb'\n{3,}')
+# Any single whitespace character, and a run of them, as str.strip() sees it
+SPACE_CHAR_RE = re.compile(rb'\n|' + HSPACE)
+LEADING_SPACE_RE = re.compile(rb'(?:\n|' + HSPACE + rb')*')
 
+# Filename suffixes stripped when inferring the slug (first match wins)
+SLUG_SUFFIXES = ("-main", "-header", "-SI", "-backmatter", "-reference")
 
+
+@functools.lru_cache(maxsize=1024)
 def infer_slug(input_path):
     base = os.path.basename(input_path)
     name = os.path.splitext(base)[0]
-    for suffix in ["-main", "-header", "-SI", "-backmatter", "-reference"]:
-        if name.endswith(suffix):
-            name = name[: -len(suffix)]
-            break
+    if name.endswith(SLUG_SUFFIXES):
+        for suffix in SLUG_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[: -len(suffix)]
+                break
     return name
 
 
-def clean_image_links(content):
-    content = IMAGE_LINK_RE.sub("", content)
-    content = re.sub(r"\n{3,}", "\n\n", content)
-    return content.strip() + "\n"
+@contextlib.contextmanager
+def read_markdown(path):
+    """
+    Yield the contents of path as a read-only mmap (bytes-like).
+    CR and CRLF line endings are normalised to LF as text-mode open() would;
+    only in that case is the file copied into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\r") == -1:
+                yield mm
+            else:
+                yield mm[:].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
 
 
-def find_boundary(lines, pattern, start=0):
-    """Return the line index of the first match of pattern at or after start."""
-    for i in range(start, len(lines)):
-        if pattern.match(lines[i]):
-            return i
-    return None
+def clean_image_links(content):
+    # Cheap substring guards skip a full regex pass when it cannot match
+    if content.find(b"![") != -1:
+        content = IMAGE_LINK_RE.sub(b"", content)
+    if content.find(b"\n\n\n") != -1:
+        content = BLANKRUN_RE.sub(b"\n\n", content)
+    start, stop = strip_span(content, 0, len(content))
+    return content[start:stop] + b"\n"
+
+
+def strip_span(data, start, stop):
+    """
+    Return the bounds of data[start:stop] with surrounding whitespace removed,
+    as str.strip() would on the decoded text, without copying the slice.
+    """
+    start = LEADING_SPACE_RE.match(data, start, max(start, stop)).end()
+    while stop > start:
+        # A whitespace character is 1-3 UTF-8 bytes; try each ending at stop
+        for n in (1, 2, 3):
+            if stop - n >= start and SPACE_CHAR_RE.fullmatch(data, stop - n, stop):
+                stop -= n
+                break
+        else:
+            break
+    return start, stop
+
+
+def write_bytes(path, *chunks):
+    """
+    Write chunks to path through a raw descriptor: one os.writev where the
+    platform has it, else one os.write per chunk.  Short writes are resumed.
+    """
+    writev = getattr(os, "writev", None)
+    views = [memoryview(c) for c in chunks if len(c)]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        while views:
+            n = writev(fd, views) if writev else os.write(fd, views[0])
+            while views and n >= len(views[0]):
+                n -= len(views.pop(0))
+            if n:
+                views[0] = views[0][n:]
+    finally:
+        os.close(fd)
+
+
+def locate_boundaries(content):
+    """
+    Return the byte offsets (abstract, reference, backmatter) of the first
+    heading of each kind in content, or None where a heading is absent.
+    """
+    found = {"abs": None, "ref": None, "bm": None}
+    missing = 3
+    for m in BOUNDARY_RE.finditer(content):
+        kind = m.lastgroup
+        if found[kind] is None:
+            found[kind] = m.start()
+            missing -= 1
+            if not missing:
+                break
+    return found["abs"], found["ref"], found["bm"]
 
 
-def find_first_backmatter(lines, start=0):
-    """Return the line index of the first backmatter heading at or after start."""
-    for i in range(start, len(lines)):
-        if BACKMATTER_RE.match(lines[i]):
-            return i
-    return None
+def find_fallback_header_end(content):
+    """
+    Return the offset of the first heading after line 3, or None.
+    Used when the article has no explicit Abstract heading.
+    """
+    pos = 0
+    for _ in range(4):
+        pos = content.find(b"\n", pos) + 1
+        if not pos:
+            return None
+    m = HEADING_RE.search(content, pos)
+    return m.start() if m else None
 
 
 def run(input_md, out_dir, slug=None):
@@ -82,72 +179,62 @@ def run(input_md, out_dir, slug=None):
     if slug is None:
         slug = infer_slug(input_md)
 
-    with open(input_md, encoding="utf-8") as f:
-        content = f.read()
-
-    content = clean_image_links(content)
-    lines = content.split("\n")
+    with read_markdown(input_md) as raw:
+        content = clean_image_links(raw)
 
     # ── Locate boundaries ──────────────────────────────────────────────────────
-    abstract_idx   = find_boundary(lines, ABSTRACT_RE)
-    reference_idx  = find_boundary(lines, REFERENCE_RE)
-    backmatter_idx = find_first_backmatter(lines)
-
-    # Fallback: if no explicit Abstract heading, header ends at first blank line
-    # after a title-like block (first few lines)
-    if abstract_idx is None:
-        # Treat everything before the first major section as header
-        for i, line in enumerate(lines):
-            if i > 0 and re.match(r'^#+\s+\S', line) and i > 3:
-                abstract_idx = i
-                break
-        if abstract_idx is None:
-            abstract_idx = 0
-        print(f"  WARNING: No 'Abstract' heading found; header/body split at line {abstract_idx}.")
-
-    if reference_idx is None:
+    abstract_off, reference_off, backmatter_off = locate_boundaries(content)
+
+    # Fallback: if no explicit Abstract heading, header ends at the first
+    # section heading after the title-like block (first few lines)
+    if abstract_off is None:
+        abstract_off = find_fallback_header_end(content)
+        if abstract_off is None:
+            abstract_off = 0
+        abstract_line = content.count(b"\n", 0, abstract_off)
+        print(f"  WARNING: No 'Abstract' heading found; header/body split at line {abstract_line}.")
+
+    if reference_off is None:
         print("  WARNING: No 'References' heading found; reference section will be empty.")
 
     # Backmatter may legitimately be absent
-    if backmatter_idx is None:
+    if backmatter_off is None:
         print("  NOTE: No backmatter sections found; {slug}-backmatter.md will not be created.")
 
     # ── Slice content ──────────────────────────────────────────────────────────
-    # Header: lines 0 .. abstract_idx (exclusive)
-    header_lines = lines[:abstract_idx]
-
-    # Main body: abstract_idx .. reference_idx (or backmatter_idx if no refs)
-    body_end = reference_idx if reference_idx is not None else backmatter_idx
+    # Parts are (start, stop) byte spans of content, written straight from a
+    # memoryview.  Every offset sits at a line start, so each part but the last
+    # ends in b"\n".
+    end = len(content)
+    view = memoryview(content)
+
+    # Main body: abstract .. reference (or backmatter if no refs)
+    body_end = reference_off if reference_off is not None else backmatter_off
     if body_end is None:
-        body_end = len(lines)
-    main_lines = lines[abstract_idx:body_end]
+        body_end = end
 
-    # References: reference_idx .. backmatter_idx (or end)
-    if reference_idx is not None:
-        ref_end = backmatter_idx if backmatter_idx is not None else len(lines)
-        reference_lines = lines[reference_idx:ref_end]
-    else:
-        reference_lines = []
-
-    # Backmatter
-    if backmatter_idx is not None:
-        backmatter_lines = lines[backmatter_idx:]
-    else:
-        backmatter_lines = []
+    # References: reference .. backmatter (or end)
+    if reference_off is not None:
+        ref_end = backmatter_off if backmatter_off is not None else end
 
-    def write_part(name, part_lines):
-        text = clean_image_links("\n".join(part_lines))
+    def write_part(name, start, stop):
+        # content was cleaned as a whole; a part only needs its edges trimmed
+        text_start, text_stop = strip_span(content, start, stop)
         path = os.path.join(out_dir, name)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(text)
-        print(f"  {name}  ({len(part_lines)} lines)")
+        write_bytes(path, view[text_start:text_stop], b"\n")
+        # Line count as content.split(b"\n") would give for this slice
+        n_lines = content.count(b"\n", start, stop) + (1 if stop == end and start < end else 0)
+        print(f"  {name}  ({n_lines} lines)")
         return path
 
-    write_part(f"{slug}-header.md",    header_lines)
-    write_part(f"{slug}-main.md",      main_lines)
-    write_part(f"{slug}-reference.md", reference_lines)
-    if backmatter_lines:
-        write_part(f"{slug}-backmatter.md", backmatter_lines)
+    write_part(f"{slug}-header.md", 0, abstract_off)
+    write_part(f"{slug}-main.md", abstract_off, body_end)
+    if reference_off is not None:
+        write_part(f"{slug}-reference.md", reference_off, ref_end)
+    else:
+        write_part(f"{slug}-reference.md", 0, 0)
+    if backmatter_off is not None:
+        write_part(f"{slug}-backmatter.md", backmatter_off, end)
     else:
         print(f"  {slug}-backmatter.md  SKIPPED (no backmatter content)")
 
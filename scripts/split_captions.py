@@ -19,144 +19,196 @@ Slug is inferred from the input filename if not provided via --slug.
 
 import sys
 import argparse
+import contextlib
+import functools
+import mmap
 import os
 import re
 
 
 # ── Caption patterns (Markdown bold format from Step 2) ───────────────────────
 
+# Horizontal whitespace: exactly what str-mode \s matches apart from \n, spelled
+# out in UTF-8 so the bytes patterns split on the same Unicode spaces (NBSP,
+# thin and ideographic spaces, ...) as the original text-mode patterns did.
+HSPACE = (
+    rb'(?:[\t\x0b\x0c\r \x1c-\x1f]|\xc2[\x85\xa0]|\xe1\x9a\x80'
+    rb'|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)'
+)
+
+# Each pattern matches a whole caption block: the "**Figure N.**" line plus
+# every following non-blank line, then swallows the blank line that ends the
+# block and its newline so the match span can be cut straight out of the text.
+# HSPACE is whitespace that never crosses a line break.  Patterns are bytes
+# so they run directly over the mmapped input.
+#
+# The block body is written as "line, then (newline + non-blank line)*" rather
+# than a lazy DOTALL body up to a "\n\n" lookahead: every repetition starts at
+# a newline and [^\n]* cannot overlap the next one, so each line is consumed
+# once and a failed match never backtracks into earlier lines.
+CAPTION_BODY = rb'[^\n]*(?:\n(?!' + HSPACE + rb'*(?:\n|\Z))[^\n]*)*'
+CAPTION_END = rb'(?:\n' + HSPACE + rb'*)?\n?'
+
 # Main article: **Figure 1.** ... or **Table 2.** ...
 CAPTION_RE_MAIN = re.compile(
-    r'^\*\*(Figure|Table)\s+(\d+)\.\*\*(.+?)(?=\n\n|\Z)',
-    re.IGNORECASE | re.DOTALL | re.MULTILINE,
+    rb'^(?P<text>\*\*(?P<kind>Figure|Table)' + HSPACE + rb'+(?P<num>\d+)\.\*\*'
+    + CAPTION_BODY + rb')' + CAPTION_END,
+    re.IGNORECASE | re.MULTILINE,
 )
 
 # SI: **Fig. S1.** ... or **Table S2.** ...
 CAPTION_RE_SI = re.compile(
-    r'^\*\*(Fig(?:ure)?\.?\s+S?\d+|Table\s+S?\d+)\.\*\*(.+?)(?=\n\n|\Z)',
-    re.IGNORECASE | re.DOTALL | re.MULTILINE,
+    rb'^(?P<text>\*\*(?P<kind>Fig(?:ure)?\.?|Table)' + HSPACE + rb'+S?(?P<num>\d+)\.\*\*'
+    + CAPTION_BODY + rb')' + CAPTION_END,
+    re.IGNORECASE | re.MULTILINE,
 )
 
-# Broader pattern used to locate any caption block line-by-line
-CAPTION_LINE_MAIN = re.compile(r'^\*\*(Figure|Table)\s+(\d+)\.\*\*', re.IGNORECASE)
-CAPTION_LINE_SI   = re.compile(r'^\*\*(Fig(?:ure)?\.?\s+(S?\d+)|Table\s+(S?\d+))\.\*\*', re.IGNORECASE)
+IMAGE_LINK_RE = re.compile(rb'!\[.*?\]\(.*?\)\n?')
+BLANKRUN_RE = re.compile(rb'\n{3,}')
+# Any single whitespace character, and a run of them, as str.strip() sees it
+SPACE_CHAR_RE = re.compile(rb'\n|' + HSPACE)
+LEADING_SPACE_RE = re.compile(rb'(?:\n|' + HSPACE + rb')*')
 
-IMAGE_LINK_RE = re.compile(r'!\[.*?\]\(.*?\)\n?')
+# Filename suffixes stripped when inferring the slug (first match wins)
+SLUG_SUFFIXES = ("-main", "-header", "-SI", "-backmatter", "-reference")
 
 
+@functools.lru_cache(maxsize=1024)
 def infer_slug(input_path):
     """Derive slug from filename by stripping known suffixes and extension."""
     base = os.path.basename(input_path)
     name = os.path.splitext(base)[0]
-    for suffix in ["-main", "-header", "-SI", "-backmatter", "-reference"]:
-        if name.endswith(suffix):
-            name = name[: -len(suffix)]
-            break
+    if name.endswith(SLUG_SUFFIXES):
+        for suffix in SLUG_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[: -len(suffix)]
+                break
     return name
 
 
 def extract_captions_main(content):
     """
     Parse caption blocks from main article Markdown.
-    Returns list of (label, caption_text) tuples and the cleaned content.
+    Returns list of (kind_norm, num, caption_text) tuples and the cleaned content
+    (content itself, uncopied, when it holds no captions).
     Caption format expected: **Figure N.** followed by text until blank line.
     """
     captions = []
-    cleaned_lines = []
-    lines = content.split("\n")
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        m = CAPTION_LINE_MAIN.match(line)
-        if m:
-            kind = m.group(1).lower()
-            num = m.group(2)
-            kind_norm = "table" if kind == "table" else "figure"
-            label = f"{kind_norm}{num}"
-            # Collect multi-line caption until blank line
-            cap_lines = [line]
-            i += 1
-            while i < len(lines) and lines[i].strip() != "":
-                cap_lines.append(lines[i])
-                i += 1
-            caption_text = "\n".join(cap_lines)
-            captions.append((label, kind_norm, caption_text))
-            # Skip the blank line
-            if i < len(lines) and lines[i].strip() == "":
-                i += 1
-        else:
-            cleaned_lines.append(line)
-            i += 1
-    return captions, "\n".join(cleaned_lines)
+    kept = []
+    pos = 0
+    m = CAPTION_RE_MAIN.search(content)
+    if m is None:
+        return captions, content
+    for m in CAPTION_RE_MAIN.finditer(content, m.start()):
+        # One groups() call, in pattern order (text, kind, num)
+        text, kind, num = m.groups()
+        kind_norm = "table" if kind.lower() == b"table" else "figure"
+        captions.append((kind_norm, num.decode(), text.decode("utf-8")))
+        kept.append(content[pos:m.start()])
+        pos = m.end()
+    kept.append(content[pos:])
+    return captions, b"".join(kept)
 
 
 def extract_captions_si(content):
     """
     Parse caption blocks from SI Markdown.
-    Labels receive 's' prefix: sfigure1, stable2.
+    Same tuples as extract_captions_main; the number has its S prefix removed
+    and write_caption_file adds the 's' label prefix: sfigure1, stable2.
     """
     captions = []
-    cleaned_lines = []
-    lines = content.split("\n")
-    i = 0
-    # Normalise SI caption number: strip leading S/s
-    num_re = re.compile(r'(Fig(?:ure)?\.?\s+|Table\s+)(S?)(\d+)', re.IGNORECASE)
-    while i < len(lines):
-        line = lines[i]
-        m = CAPTION_LINE_SI.match(line)
-        if m:
-            # Extract kind and number from the full match
-            header = m.group(1)
-            nm = num_re.search(header)
-            if nm:
-                kind_raw = nm.group(1).lower().strip().rstrip(".")
-                num = nm.group(3)
-                kind_norm = "table" if "table" in kind_raw else "figure"
-                label = f"s{kind_norm}{num}"
+    kept = []
+    pos = 0
+    m = CAPTION_RE_SI.search(content)
+    if m is None:
+        return captions, content
+    for m in CAPTION_RE_SI.finditer(content, m.start()):
+        # num excludes the S/s prefix: **Fig. S3.** -> ("figure", "3")
+        kind_norm = "table" if m.group("kind").lower() == b"table" else "figure"
+        captions.append((kind_norm, m.group("num").decode(), m.group("text").decode("utf-8")))
+        kept.append(content[pos:m.start()])
+        pos = m.end()
+    kept.append(content[pos:])
+    return captions, b"".join(kept)
+
+
+@contextlib.contextmanager
+def read_markdown(path):
+    """
+    Yield the contents of path as a read-only mmap (bytes-like).
+    CR and CRLF line endings are normalised to LF as text-mode open() would;
+    only in that case is the file copied into memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\r") == -1:
+                yield mm
             else:
-                label = "sfigure_unknown"
-                kind_norm = "figure"
-
-            cap_lines = [line]
-            i += 1
-            while i < len(lines) and lines[i].strip() != "":
-                cap_lines.append(lines[i])
-                i += 1
-            caption_text = "\n".join(cap_lines)
-            captions.append((label, kind_norm, caption_text))
-            if i < len(lines) and lines[i].strip() == "":
-                i += 1
-        else:
-            cleaned_lines.append(line)
-            i += 1
-    return captions, "\n".join(cleaned_lines)
+                yield mm[:].replace(b"\r\n", b"\n").replace(b"\r", b"\n")
 
 
 def clean_image_links(content):
     """Remove all Markdown image links and collapse excess blank lines."""
-    content = IMAGE_LINK_RE.sub("", content)
-    content = re.sub(r"\n{3,}", "\n\n", content)
-    return content.strip() + "\n"
+    # Cheap substring guards skip a full regex pass when it cannot match
+    if content.find(b"![") != -1:
+        content = IMAGE_LINK_RE.sub(b"", content)
+    if content.find(b"\n\n\n") != -1:
+        content = BLANKRUN_RE.sub(b"\n\n", content)
+    start, stop = strip_span(content, 0, len(content))
+    return content[start:stop] + b"\n"
 
 
-def write_caption_file(label, kind_norm, caption_text, slug, out_dir, si):
-    """Write a single caption to its .md file."""
-    filename = f"{slug}-{label}.md"
-    out_path = os.path.join(out_dir, filename)
+def strip_span(data, start, stop):
+    """
+    Return the bounds of data[start:stop] with surrounding whitespace removed,
+    as str.strip() would on the decoded text, without copying the slice.
+    """
+    start = LEADING_SPACE_RE.match(data, start, max(start, stop)).end()
+    while stop > start:
+        # A whitespace character is 1-3 UTF-8 bytes; try each ending at stop
+        for n in (1, 2, 3):
+            if stop - n >= start and SPACE_CHAR_RE.fullmatch(data, stop - n, stop):
+                stop -= n
+                break
+        else:
+            break
+    return start, stop
+
 
+def write_bytes(path, *chunks):
+    """
+    Write chunks to path through a raw descriptor: one os.writev where the
+    platform has it, else one os.write per chunk.  Short writes are resumed.
+    """
+    writev = getattr(os, "writev", None)
+    views = [memoryview(c) for c in chunks if len(c)]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        while views:
+            n = writev(fd, views) if writev else os.write(fd, views[0])
+            while views and n >= len(views[0]):
+                n -= len(views.pop(0))
+            if n:
+                views[0] = views[0][n:]
+    finally:
+        os.close(fd)
+
+
+def write_caption_file(kind_norm, num, caption_text, slug, out_dir, si):
+    """Write a single caption to its .md file."""
     if si:
-        # e.g. label = sfigure1 -> "Supplementary Figure 1"
-        num = re.sub(r'^s(figure|table)', '', label)
-        kind_display = "Figure" if "figure" in label else "Table"
-        heading = f"Supplementary {kind_display} {num}"
+        # e.g. figure, 1 -> sfigure1.md, "Supplementary Figure 1"
+        filename = f"{slug}-s{kind_norm}{num}.md"
+        heading = f"Supplementary {kind_norm.capitalize()} {num}"
     else:
-        num = re.sub(r'^(figure|table)', '', label)
-        kind_display = "Figure" if "figure" in label else "Table"
-        heading = f"{kind_display} {num}"
+        filename = f"{slug}-{kind_norm}{num}.md"
+        heading = f"{kind_norm.capitalize()} {num}"
+    out_path = os.path.join(out_dir, filename)
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(f"# {heading}\n\n")
-        f.write(caption_text.strip() + "\n")
+    write_bytes(out_path, f"# {heading}\n\n".encode("utf-8"), caption_text.strip().encode("utf-8"), b"\n")
 
     return out_path
 
@@ -166,25 +218,21 @@ def run(input_md, out_dir, slug=None, si=False, out_main=None):
     if slug is None:
         slug = infer_slug(input_md)
 
-    with open(input_md, encoding="utf-8") as f:
-        content = f.read()
-
-    if si:
-        captions, cleaned = extract_captions_si(content)
-    else:
-        captions, cleaned = extract_captions_main(content)
-
-    cleaned = clean_image_links(cleaned)
+    # The map is closed before the cleaned text is written, which may be
+    # back over input_md.
+    with read_markdown(input_md) as content:
+        extract = extract_captions_si if si else extract_captions_main
+        captions, cleaned = extract(content)
+        cleaned = clean_image_links(cleaned)
 
     # Write caption files
-    for label, kind_norm, caption_text in captions:
-        path = write_caption_file(label, kind_norm, caption_text, slug, out_dir, si)
+    for kind_norm, num, caption_text in captions:
+        path = write_caption_file(kind_norm, num, caption_text, slug, out_dir, si)
         print(f"  {os.path.basename(path)}")
 
     # Write cleaned source .md
     dest = out_main if out_main else input_md
-    with open(dest, "w", encoding="utf-8") as f:
-        f.write(cleaned)
+    write_bytes(dest, cleaned)
     print(f"\n  Cleaned source -> {dest}")
     print(f"  {len(captions)} caption(s) extracted.")
     return captions